@@ -1,85 +1,169 @@
 # 将原cleaner.py内容封装为模块
 import os
+import re
 import sys
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def main():
+# 支持dir_fd的平台上通过unlinkat删除文件，避免每次删除都重新解析完整路径
+_HAVE_DIR_FD = os.unlink in os.supports_dir_fd and hasattr(os, 'O_DIRECTORY')
+
+# 删除操作为阻塞的I/O系统调用（执行时释放GIL），使用线程池并行处理
+_MAX_WORKERS = min(32, (os.cpu_count() or 4) * 4)
+
+# 文件名包含英文括号的webp文件（预编译，忽略大小写，避免逐个文件调用lower()）
+_BAD_WEBP = re.compile(r'.*[()].*\.webp\Z', re.IGNORECASE | re.DOTALL)
+_BAD_WEBP_BYTES = re.compile(rb'.*[()].*\.webp\Z', re.IGNORECASE | re.DOTALL)
+
+# POSIX系统上以bytes路径遍历：目录项名称无需逐个解码，删除时也无需重新编码
+_BYTES_PATHS = os.name == 'posix'
+
+def _unlink(entry, dir_fd):
+    """删除目录项，优先使用已打开的目录句柄"""
+    if dir_fd is None:
+        os.remove(entry.path)
+    else:
+        os.unlink(entry.name, dir_fd=dir_fd)
+
+def _delete_batch(directory, batch):
+    """删除同一目录下的一批文件，返回每个文件的(类型, 目录项, 异常)"""
+    dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY) if _HAVE_DIR_FD else None
+    try:
+        # 快速路径：整批删除只需一层异常处理
+        done = 0
+        try:
+            for kind, entry in batch:
+                _unlink(entry, dir_fd)
+                done += 1
+        except Exception:
+            pass
+        results = [(kind, entry, None) for kind, entry in batch[:done]]
+        
+        # 出错后对剩余文件逐个删除，分别记录异常
+        for kind, entry in batch[done:]:
+            try:
+                _unlink(entry, dir_fd)
+                results.append((kind, entry, None))
+            except Exception as e:
+                results.append((kind, entry, e))
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+    return results
+
+def main(current_dir=None, log=None):
     """清理目录中的特定文件，如没有适配的文件则跳过清理步骤"""
+    # log为输出函数，默认使用print；GUI中可直接传入日志回调，绕过sys.stdout重定向
+    log = log or print
     try:
-        # 获取当前程序所在目录
-        if getattr(sys, 'frozen', False):
-            # 打包后的应用
-            current_dir = os.path.dirname(sys.executable)
-        else:
-            # 开发环境
-            current_dir = os.path.dirname(os.path.abspath(__file__))
+        # 未指定目录时使用当前程序所在目录
+        if current_dir is None:
+            if getattr(sys, 'frozen', False):
+                # 打包后的应用
+                current_dir = os.path.dirname(sys.executable)
+            else:
+                # 开发环境
+                current_dir = os.path.dirname(os.path.abspath(__file__))
         
-        print(f"开始清理目录: {current_dir}")
+        log(f"开始清理目录: {current_dir}")
         
         # 检查目录是否存在
         if not os.path.exists(current_dir):
-            print(f"⚠️ 警告: 目录不存在 - {current_dir}")
-            print("跳过清理步骤，继续后续处理...")
+            log(f"⚠️ 警告: 目录不存在 - {current_dir}")
+            log("跳过清理步骤，继续后续处理...")
             return
         
-        # 检查是否有需要清理的文件，避免不必要的遍历
-        has_icon_files = False
-        has_webp_files = False
-        
-        # 先简单检查是否有需要清理的文件类型
-        for root, dirs, files in os.walk(current_dir):
-            for file in files:
-                if file == "icon.png":
-                    has_icon_files = True
-                elif file.lower().endswith('.webp') and ('(' in file or ')' in file):
-                    has_webp_files = True
-            # 如果两种类型的文件都找到了，可以提前结束检查
-            if has_icon_files and has_webp_files:
-                break
-        
-        # 如果没有任何需要清理的文件，直接跳过
-        if not has_icon_files and not has_webp_files:
-            print("ℹ️ 未找到需要清理的文件(icon.png或含括号的webp文件)")
-            print("跳过清理步骤，继续后续处理...")
-            return
+        # 记录根目录所在设备，遍历时不跨越挂载点（如网络共享）
+        root_dev = os.stat(current_dir).st_dev
         
         # 统计删除的文件数量
         icon_count = 0
         webp_count = 0
         
-        # 遍历当前目录及其所有子目录
-        for root, dirs, files in os.walk(current_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
+        # 使用os.scandir迭代遍历当前目录及其所有子目录（单次遍历，边检测边删除）
+        # 每个目录的匹配文件作为一批提交到线程池删除，输出统一在主线程完成
+        with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as pool:
+            futures = []
+            if _BYTES_PATHS:
+                stack = [os.fsencode(current_dir)]
+                icon_name = b"icon.png"
+                match_bad_webp = _BAD_WEBP_BYTES.match
+            else:
+                stack = [current_dir]
+                icon_name = "icon.png"
+                match_bad_webp = _BAD_WEBP.match
+            # 热循环中使用的方法预先绑定为局部变量，减少逐项的属性查找
+            push_dir = stack.append
+            while stack:
+                directory = stack.pop()
+                batch = []
+                try:
+                    with os.scandir(directory) as it:
+                        for entry in it:
+                            # 文件类型依赖readdir返回的d_type判断；符号链接一律跳过，
+                            # 无法判断类型的异常条目直接跳过，不再重试
+                            try:
+                                if entry.is_symlink():
+                                    continue
+                                if entry.is_dir(follow_symlinks=False):
+                                    # 位于其他设备上的子目录不进入
+                                    if os.stat(entry.path, follow_symlinks=False).st_dev == root_dev:
+                                        push_dir(entry.path)
+                                    continue
+                            except OSError:
+                                continue
+                            
+                            name = entry.name
+                            # 检查是否为icon.png
+                            if name == icon_name:
+                                batch.append(("icon", entry))
+                            # 检查是否为webp文件且文件名包含英文括号
+                            elif match_bad_webp(name):
+                                batch.append(("webp", entry))
+                except OSError as e:
+                    # 无法读取的目录只报告并跳过，不中断整个清理
+                    log(f"⚠️ 无法读取目录 {os.fsdecode(directory)}: {e}")
                 
-                # 检查是否为icon.png
-                if file == "icon.png":
-                    print(f"🗑️ 删除 icon.png 文件: {file_path}")
-                    try:
-                        os.remove(file_path)
+                if batch:
+                    futures.append(pool.submit(_delete_batch, directory, batch))
+            
+            # 每个目录的输出先缓存，再一次性写出，避免逐行输出带来的开销
+            log_lines = []
+            for future in as_completed(futures):
+                for kind, entry, error in future.result():
+                    file_path = os.fsdecode(entry.path)
+                    if error is not None:
+                        # 错误行单独输出：界面按每条消息开头的字符着色
+                        if log_lines:
+                            log('\n'.join(log_lines))
+                            log_lines.clear()
+                        log(f"❌ 删除文件时出错 {file_path}: {error}")
+                    elif kind == "icon":
+                        log_lines.append(f"🗑️ 删除 icon.png 文件: {file_path}")
                         icon_count += 1
-                    except Exception as e:
-                        print(f"❌ 删除文件时出错 {file_path}: {e}")
-                
-                # 检查是否为webp文件且文件名包含英文括号
-                elif file.lower().endswith('.webp') and ('(' in file or ')' in file):
-                    print(f"🗑️ 删除包含括号的webp文件: {file_path}")
-                    try:
-                        os.remove(file_path)
+                    else:
+                        log_lines.append(f"🗑️ 删除包含括号的webp文件: {file_path}")
                         webp_count += 1
-                    except Exception as e:
-                        print(f"❌ 删除文件时出错 {file_path}: {e}")
+                if log_lines:
+                    log('\n'.join(log_lines))
+                    log_lines.clear()
+        
+        # 遍历中没有发现任何需要清理的文件
+        if not futures:
+            log("ℹ️ 未找到需要清理的文件(icon.png或含括号的webp文件)")
+            log("跳过清理步骤，继续后续处理...")
+            return
         
-        print(f"\n✅ 清理完成!")
+        log(f"\n✅ 清理完成!")
         if icon_count > 0:
-            print(f"共删除 {icon_count} 个 icon.png 文件")
+            log(f"共删除 {icon_count} 个 icon.png 文件")
         if webp_count > 0:
-            print(f"共删除 {webp_count} 个含括号的webp文件")
+            log(f"共删除 {webp_count} 个含括号的webp文件")
         if icon_count == 0 and webp_count == 0:
-            print("未删除任何文件")
+            log("未删除任何文件")
     
     except Exception as e:
-        print(f"❌ 清理过程中发生未预期错误:")
-        print(f"{str(e)}")
-        print(f"{traceback.format_exc()}")
-        print("⚠️ 跳过清理步骤，继续后续处理...")
\ No newline at end of file
+        log(f"❌ 清理过程中发生未预期错误:")
+        log(f"{str(e)}")
+        log(f"{traceback.format_exc()}")
+        log("⚠️ 跳过清理步骤，继续后续处理...")
\ No newline at end of file
@@ -1,20 +1,47 @@
 import sys
 import os
 import logging
+import multiprocessing
 import builtins  # 添加builtins模块导入
+import html
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QProgressBar, QTextEdit, QMessageBox
+    QPushButton, QLabel, QProgressBar, QPlainTextEdit, QMessageBox
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QDateTime
-from PyQt5.QtGui import QIcon, QColor, QPalette, QFont, QTextCursor
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QDateTime, QMutex, QTimer
+from PyQt5.QtGui import QIcon, QColor, QPalette, QFont
 import cleaner_module
-import old_module
-import new_module
+
+
+class BufferedRedirector:
+    """缓冲工作线程的输出，由主窗口定时批量取出显示"""
+
+    def __init__(self):
+        self.buf = []
+        self.mutex = QMutex()
+
+    def write(self, text):
+        if text.strip():  # 忽略空行
+            self.mutex.lock()
+            try:
+                self.buf.append(text.rstrip("\n"))
+            finally:
+                self.mutex.unlock()
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """取出并清空当前缓冲的全部文本"""
+        self.mutex.lock()
+        try:
+            chunk, self.buf = self.buf, []
+        finally:
+            self.mutex.unlock()
+        return chunk
 
 
 class ProcessingWorker(QThread):
-    update_log = pyqtSignal(str)
     update_progress = pyqtSignal(int)
     finished = pyqtSignal(bool, str)
 
@@ -22,6 +49,7 @@ class ProcessingWorker(QThread):
         super().__init__()
         self.method_type = method_type  # "new" or "old"
         self.working_dir = working_dir
+        self.output = BufferedRedirector()
 
     def run(self):
         try:
@@ -29,37 +57,28 @@ class ProcessingWorker(QThread):
             original_stdout = sys.stdout
             original_stderr = sys.stderr
 
-            # 重定向标准输出
-            class OutputRedirector:
-                def __init__(self, signal):
-                    self.signal = signal
-
-                def write(self, text):
-                    if text.strip():  # 忽略空行
-                        self.signal.emit(text)
-
-                def flush(self):
-                    pass
+            # 重定向标准输出到缓冲区
+            sys.stdout = self.output
+            sys.stderr = self.output
 
-            sys.stdout = OutputRedirector(self.update_log)
-            sys.stderr = OutputRedirector(self.update_log)
-
-            # 设置工作目录
-            os.chdir(self.working_dir)
-            self.update_log.emit(f"设置工作目录: {self.working_dir}")
+            # 工作目录直接传给各模块，不修改进程的当前目录
+            self.output.write(f"设置工作目录: {self.working_dir}")
 
             # 第一步：执行cleaner
-            self.update_log.emit("\n" + "=" * 50)
-            self.update_log.emit("开始执行清理操作...")
-            self.update_log.emit("=" * 50)
+            self.output.write("\n" + "=" * 50)
+            self.output.write("开始执行清理操作...")
+            self.output.write("=" * 50)
             self.update_progress.emit(10)
-            cleaner_module.main()
+            cleaner_module.main(self.working_dir, log=self.output.write)
 
             # 第二步：执行选择的方法
             if self.method_type == "new":
-                self.update_log.emit("\n" + "=" * 50)
-                self.update_log.emit("开始使用新方法处理文件...")
-                self.update_log.emit("=" * 50)
+                # 按需导入，只加载所选方法对应的模块
+                import new_module
+
+                self.output.write("\n" + "=" * 50)
+                self.output.write("开始使用新方法处理文件...")
+                self.output.write("=" * 50)
                 self.update_progress.emit(40)
 
                 # 为new_module提供自动确认 - 完全覆盖input函数
@@ -69,30 +88,32 @@ class ProcessingWorker(QThread):
                     """在GUI模式下自动确认所有输入请求"""
                     # 自动确认所有提示
                     response = "y"
-                    self.update_log.emit(f"\n[GUI自动确认] {prompt} ➜ '{response}'")
+                    self.output.write(f"\n[GUI自动确认] {prompt} ➜ '{response}'")
                     return response
 
                 # 安全地覆盖内置input函数
                 builtins.input = auto_input
 
                 try:
-                    new_module.main()
+                    new_module.main(self.working_dir)
                 finally:
                     # 确保恢复原始input函数
                     builtins.input = original_input
             else:  # 旧方法
-                self.update_log.emit("\n" + "=" * 50)
-                self.update_log.emit("开始使用旧方法处理文件...")
-                self.update_log.emit("=" * 50)
+                import old_module
+
+                self.output.write("\n" + "=" * 50)
+                self.output.write("开始使用旧方法处理文件...")
+                self.output.write("=" * 50)
                 self.update_progress.emit(40)
-                old_module.main()
+                old_module.main(self.working_dir)
 
             self.update_progress.emit(100)
             self.finished.emit(True, "✅ 处理成功完成！")
         except Exception as e:
             import traceback
             error_msg = f"❌ 处理过程中发生错误:\n{str(e)}\n\n{traceback.format_exc()}"
-            self.update_log.emit(error_msg)
+            self.output.write(error_msg)
             self.finished.emit(False, error_msg)
         finally:
             # 恢复标准输出
@@ -220,11 +241,12 @@ class MainWindow(QMainWindow):
         log_label = QLabel("处理日志:")
         log_label.setStyleSheet("color: #808080; font-size: 10pt;")
         layout.addWidget(log_label)
-        self.log_area = QTextEdit()
+        self.log_area = QPlainTextEdit()
         self.log_area.setReadOnly(True)
+        self.log_area.setMaximumBlockCount(5000)  # 只保留最近的日志行，追加为常数时间
         self.log_area.setFont(QFont("Consolas", 10))
         self.log_area.setStyleSheet("""
-            QTextEdit {
+            QPlainTextEdit {
                 background-color: #2B2B2B;
                 color: #A9B7C6;
                 border: 1px solid #313335;
@@ -248,6 +270,9 @@ class MainWindow(QMainWindow):
         # 工作线程
         self.worker = None
 
+        # 定时从工作线程的缓冲区取出日志，批量写入日志区域
+        self.log_timer = QTimer(self, interval=50, timeout=self._drain_log)
+
         # 初始化日志
         self.init_log()
 
@@ -297,25 +322,42 @@ class MainWindow(QMainWindow):
 
     def add_log(self, text):
         """添加日志文本"""
-        cursor = self.log_area.textCursor()
-        cursor.movePosition(QTextCursor.End)
-        self.log_area.setTextCursor(cursor)
+        # 每次追加都是新的一行，去掉末尾多余的换行
+        text = text.rstrip("\n")
 
         # 为特定文本添加颜色
         if text.startswith("✅"):
-            self.log_area.setTextColor(QColor(84, 160, 96))  # 成功绿色
+            color = "#54A060"  # 成功绿色
         elif text.startswith("❌"):
-            self.log_area.setTextColor(QColor(204, 85, 85))  # 错误红色
+            color = "#CC5555"  # 错误红色
         elif "=" * 20 in text:
-            self.log_area.setTextColor(QColor(104, 151, 187))  # 进度蓝色
+            color = "#6897BB"  # 进度蓝色
         else:
-            self.log_area.setTextColor(QColor(169, 183, 198))  # 默认文字色
+            # 默认文字色直接追加纯文本
+            self.log_area.appendPlainText(text)
+            return
 
-        self.log_area.insertPlainText(text)
-        self.log_area.ensureCursorVisible()
+        escaped = html.escape(text).replace("\n", "<br>")
+        self.log_area.appendHtml(f'<span style="color: {color}; white-space: pre-wrap;">{escaped}</span>')
 
-        # 恢复默认颜色
-        self.log_area.setTextColor(QColor(169, 183, 198))
+    def add_log_batch(self, texts):
+        """批量添加日志文本，期间暂停界面刷新，结束后只滚动一次"""
+        self.log_area.setUpdatesEnabled(False)
+        try:
+            for text in texts:
+                self.add_log(text)
+        finally:
+            self.log_area.setUpdatesEnabled(True)
+        scrollbar = self.log_area.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+
+    def _drain_log(self):
+        """将工作线程缓冲的日志批量写入日志区域"""
+        if self.worker is None:
+            return
+        chunk = self.worker.output.drain()
+        if chunk:
+            self.add_log_batch(chunk)
 
     def start_processing(self, method_type):
         """开始处理文件"""
@@ -352,13 +394,16 @@ class MainWindow(QMainWindow):
 
         # 创建并启动工作线程
         self.worker = ProcessingWorker(method_type, self.working_dir)
-        self.worker.update_log.connect(self.add_log)
         self.worker.update_progress.connect(self.progress_bar.setValue)
         self.worker.finished.connect(self.processing_finished)
         self.worker.start()
+        self.log_timer.start()
 
     def processing_finished(self, success, message):
         """处理完成后的回调"""
+        self.log_timer.stop()
+        self._drain_log()
+
         self.new_method_btn.setEnabled(True)
         self.old_method_btn.setEnabled(True)
 
@@ -383,6 +428,9 @@ class MainWindow(QMainWindow):
 
 
 def main():
+    # 打包为exe后，处理模块使用的进程池子进程需要此调用才能正常启动
+    multiprocessing.freeze_support()
+
     app = QApplication(sys.argv)
 
     # 设置应用样式和字体
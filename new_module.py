@@ -1,6 +1,8 @@
 import os
 import sys
 import logging
+import logging.handlers
+import atexit
 import shutil
 import zipfile
 import re
@@ -11,8 +13,25 @@ from pathlib import Path
 from datetime import datetime
 from PIL import Image
 from typing import Set, List, Dict, Any, Optional, Tuple
-import tempfile
 import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import PIL
+import errno
+import ctypes
+
+# 可选：使用numpy向量化合成透明图像，未安装时使用PIL合成
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 可选：使用libjpeg-turbo直接编码JPEG，未安装时回退到PIL编码器
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+except ImportError:
+    TurboJPEG = None
 
 # ====================== 配置常量 ======================
 DEFAULT_CONFIG = {
@@ -25,9 +44,46 @@ DEFAULT_CONFIG = {
     "skip_step_confirmations": False,
     "dry_run": False,
     "max_files_per_dir": 1000,
+    "backup_hardlink": True,  # 备份与源目录在同一文件系统时使用硬链接代替复制
+    "parallel_moves": 8,  # 步骤5并行移动文件的线程数
+    "verify_zip": False,  # 压缩后重新打开ZIP并校验CRC（较慢）
+    "compress_chunk_bytes": 1024 * 1024,  # 写入ZIP时每次读取源文件的字节数
+    "store_jpg": True,  # 叶目录只含JPG（已压缩），直接存储不再DEFLATE；选择压缩级别时自动关闭
     "progress_update_freq": 0.01  # 每1%更新一次进度，提高刷新频率
 }
 
+# 图像数量达到此值时才启用多进程转换，避免少量文件时的进程启动开销
+PARALLEL_CONVERT_MIN_FILES = 8
+# 并行工作进程数；Windows上ProcessPoolExecutor最多支持61个进程，超过会抛出ValueError
+MAX_WORKERS = min(os.cpu_count() or 1, 61)
+
+# 已解析的配置文件缓存：{配置文件路径: (修改时间, 配置字典)}
+_CONFIG_CACHE: Dict[Path, Tuple[float, Dict[str, Any]]] = {}
+
+# Linux上可用copy_file_range在内核中复制文件（btrfs/xfs上为reflink，不复制数据）
+_HAVE_COPY_FILE_RANGE = hasattr(os, 'copy_file_range')
+
+# Linux上使用renameat2(RENAME_NOREPLACE)实现“目标不存在才重命名”的原子操作
+_AT_FDCWD = -100
+_RENAME_NOREPLACE = 1
+_renameat2 = None
+if sys.platform.startswith('linux'):
+    try:
+        _renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+        _renameat2.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+        _renameat2.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        _renameat2 = None  # glibc过旧，不提供renameat2
+
+# 视为JPG的小写扩展名
+JPG_SUFFIXES = frozenset(('.jpg', '.jpeg'))
+
+# 超过此像素数的透明图像改用PIL合成，避免numpy中间数组占用过多内存
+NUMPY_COMPOSITE_MAX_PIXELS = 10_000_000
+
+# 自然排序使用的数字分段正则（预编译）
+_NUM_RE = re.compile(r'(\d+)')
+
 # ====================== 工具函数 ======================
 def get_root() -> Path:
     """获取正确的根目录路径"""
@@ -44,25 +100,123 @@ def setup_logging(root_dir: Path):
     # 确保日志文件的父目录存在
     log_file.parent.mkdir(parents=True, exist_ok=True)
     
-    logging.basicConfig(
-        filename=str(log_file),
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        filemode='w',
-        encoding='utf-8'
-    )
-    return logging.getLogger(__name__)
+    log = logging.getLogger(__name__)
+    # 关闭上一次运行留下的处理器（GUI中main可能被多次调用）
+    for handler in log.handlers[:]:
+        log.removeHandler(handler)
+        target = getattr(handler, 'target', None)
+        handler.close()
+        if target:
+            target.close()
+    
+    file_handler = logging.FileHandler(str(log_file), mode='w', encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    # 日志先缓存在内存中，每4096条或出现ERROR时批量写入文件，避免逐条写盘
+    memory_handler = logging.handlers.MemoryHandler(4096, flushLevel=logging.ERROR, target=file_handler)
+    log.addHandler(memory_handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    atexit.register(memory_handler.flush)
+    return log
+
+def flush_logs():
+    """将缓存的日志写入文件"""
+    if logger:
+        for handler in logger.handlers:
+            handler.flush()
 
 # 定义全局logger
 logger = None
 
-def natural_sort_key(path: Path) -> list:
-    """自然排序键函数"""
+@lru_cache(maxsize=65536)
+def _natural_sort_key_cached(name: str) -> tuple:
+    """按文件名计算自然排序键（结果缓存，各步骤重复排序同名文件时直接复用）"""
     try:
-        return [int(text) if text.isdigit() else text.lower() for text in re.split(r'(\d+)', path.name)]
+        return tuple(int(text) if text.isdigit() else text.lower() for text in _NUM_RE.split(name))
     except Exception:
         # 出错时回退到普通排序
-        return [path.name.lower()]
+        return (name.lower(),)
+
+def natural_sort_key(path: Path) -> tuple:
+    """自然排序键函数"""
+    return _natural_sort_key_cached(path.name)
+
+def _fast_copy(src: str, dst: str):
+    """复制文件内容和元数据，优先使用copy_file_range"""
+    if _HAVE_COPY_FILE_RANGE:
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            shutil.copystat(src, dst)
+            return
+        except OSError:
+            pass  # 文件系统不支持等情况，回退到shutil.copyfile
+    # shutil.copyfile在Linux上使用sendfile，在macOS上使用fcopyfile
+    shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
+
+def scan_tree(root: Path, skip_dirs, image_exts) -> Tuple[List[str], List[str], List[str], List[int]]:
+    """单次遍历目录树，收集图像文件信息
+    
+    返回并行列表 (dirs, names, suffixes, parent_idx)：dirs为遍历到的目录路径，
+    其余三个列表按文件对齐，分别为文件名、小写扩展名及所在目录在dirs中的下标。
+    名称在skip_dirs中的目录不会进入遍历。
+    """
+    skip = frozenset(skip_dirs)
+    exts = frozenset(image_exts)
+    dirs, names, suffixes, parent_idx = [], [], [], []
+    stack = [str(root)]
+    while stack:
+        directory = stack.pop()
+        dir_idx = len(dirs)
+        dirs.append(directory)
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    name = entry.name
+                    if name in skip:
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        suffix = os.path.splitext(name)[1].lower()
+                        if suffix in exts:
+                            names.append(name)
+                            suffixes.append(suffix)
+                            parent_idx.append(dir_idx)
+        except OSError as e:
+            logger.warning(f"读取目录失败 {directory}: {e}")
+    return dirs, names, suffixes, parent_idx
+
+class TreeSnapshot:
+    """目录树中图像文件的单次扫描结果，供结构验证、备份和步骤1共享"""
+    def __init__(self, dirs: List[str], names: List[str], suffixes: List[str], parent_idx: List[int]):
+        self.dirs = dirs
+        self.names = names
+        self.suffixes = suffixes
+        self.parent_idx = parent_idx
+    
+    @classmethod
+    def from_root(cls, root: Path, config: "ConfigManager") -> "TreeSnapshot":
+        """遍历根目录生成快照（跳过skip_dirs）"""
+        return cls(*scan_tree(root, config["skip_dirs"], config["image_exts"]))
+    
+    def __len__(self) -> int:
+        return len(self.names)
+    
+    def non_jpg_images(self) -> List[Path]:
+        """返回扩展名不是JPG/JPEG的图像文件"""
+        dirs = self.dirs
+        return [
+            Path(dirs[dir_idx], name)
+            for name, suffix, dir_idx in zip(self.names, self.suffixes, self.parent_idx)
+            if suffix not in JPG_SUFFIXES
+        ]
 
 def confirm_operation(message: str, config: "ConfigManager") -> bool:
     """确认操作，根据配置决定是否需要用户确认"""
@@ -88,14 +242,27 @@ def confirm_operation(message: str, config: "ConfigManager") -> bool:
     # 空或 'y' 为确认
     return response in ['', 'y']
 
+def _rename_noreplace(src: str, dst: str):
+    """重命名文件或目录，目标已存在时抛出FileExistsError"""
+    if _renameat2 is not None:
+        if _renameat2(_AT_FDCWD, os.fsencode(src), _AT_FDCWD, os.fsencode(dst), _RENAME_NOREPLACE) == 0:
+            return
+        err = ctypes.get_errno()
+        # EINVAL/ENOSYS表示内核或文件系统不支持该标志，回退到普通重命名
+        if err not in (errno.EINVAL, errno.ENOSYS):
+            raise OSError(err, os.strerror(err), src, None, dst)
+    # Windows上os.rename本身在目标存在时抛出FileExistsError
+    if os.name != 'nt' and os.path.lexists(dst):
+        raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), src, None, dst)
+    os.rename(src, dst)
+
 def safe_rename(src: Path, dst: Path, backup_manager: "BackupManager", config: "ConfigManager") -> bool:
     """安全的重命名函数"""
-    if not src.exists():
-        logger.error(f"源文件不存在: {src}")
-        return False
-    
     if config["dry_run"]:
-        logger.info(f"[DRY RUN] 将重命名 {src} -> {dst}")
+        if not src.exists():
+            logger.error(f"源文件不存在: {src}")
+            return False
+        logger.info("[DRY RUN] 将重命名 %s -> %s", src, dst)
         if backup_manager:
             backup_manager.record_operation("rename", src, dst)
         return True
@@ -104,24 +271,29 @@ def safe_rename(src: Path, dst: Path, backup_manager: "BackupManager", config: "
         if src == dst:
             return True
         
-        # 检查目标是否已存在
+        # 直接尝试不覆盖的重命名，目标已存在时再换用带序号的文件名；
+        # 源文件不存在时rename本身会报错，无需预先stat
         final_dst = dst
         counter = 1
-        while final_dst.exists():
-            new_name = f"{dst.stem}_{counter}{dst.suffix}"
-            final_dst = dst.parent / new_name
-            counter += 1
-            if counter > 100:  # 防止无限循环
-                logger.error(f"无法找到唯一文件名: {dst}")
-                return False
+        while True:
+            try:
+                _rename_noreplace(str(src), str(final_dst))
+                break
+            except FileExistsError:
+                if counter >= 100:  # 防止无限循环
+                    logger.error(f"无法找到唯一文件名: {dst}")
+                    return False
+                final_dst = dst.parent / f"{dst.stem}_{counter}{dst.suffix}"
+                counter += 1
         
         # 记录操作用于回滚
         if backup_manager:
             backup_manager.record_operation("rename", src, final_dst)
-        
-        src.rename(final_dst)
-        logger.info(f"重命名 {src} -> {final_dst}")
+        logger.info("重命名 %s -> %s", src, final_dst)
         return True
+    except FileNotFoundError:
+        logger.error(f"源文件不存在: {src}")
+        return False
     except Exception as e:
         logger.error(f"重命名失败 {src} -> {dst}: {e}")
         return False
@@ -147,17 +319,27 @@ class ConfigManager:
     
     def load_config(self):
         """从文件加载配置"""
-        if self.config_file.exists():
-            try:
+        try:
+            mtime = self.config_file.stat().st_mtime
+        except OSError:
+            return  # 配置文件不存在
+        
+        try:
+            # 文件未修改时直接使用缓存，避免重复读取和解析JSON
+            cached = _CONFIG_CACHE.get(self.config_file)
+            if cached and cached[0] == mtime:
+                loaded_config = cached[1]
+            else:
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     loaded_config = json.load(f)
-                # 只合并已知的配置项，避免未知键
-                for key in self.config.keys():
-                    if key in loaded_config:
-                        self.config[key] = loaded_config[key]
-                logger.info(f"配置已从 {self.config_file} 加载")
-            except Exception as e:
-                logger.warning(f"加载配置失败: {e}，使用默认配置")
+                _CONFIG_CACHE[self.config_file] = (mtime, loaded_config)
+            # 只合并已知的配置项，避免未知键
+            for key in self.config.keys():
+                if key in loaded_config:
+                    self.config[key] = loaded_config[key]
+            logger.info(f"配置已从 {self.config_file} 加载")
+        except Exception as e:
+            logger.warning(f"加载配置失败: {e}，使用默认配置")
     
     def save_config(self):
         """保存配置到文件"""
@@ -165,6 +347,7 @@ class ConfigManager:
             self.config_file.parent.mkdir(parents=True, exist_ok=True)
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(self.config, f, indent=2, ensure_ascii=False)
+            _CONFIG_CACHE[self.config_file] = (self.config_file.stat().st_mtime, self.config.copy())
             logger.info(f"配置已保存到 {self.config_file}")
         except Exception as e:
             logger.error(f"保存配置失败: {e}")
@@ -190,8 +373,9 @@ class ConfigManager:
             print(f"6. 模拟运行模式(Dry Run): {'启用' if self['dry_run'] else '禁用'}")
             print("7. 保存配置并返回")
             print("8. 放弃更改并返回")
+            print(f"9. JPG直接存储: {'启用' if self['store_jpg'] else '禁用'}")
             
-            choice = input("\n请选择要修改的配置项 [1-8]: ").strip()
+            choice = input("\n请选择要修改的配置项 [1-9]: ").strip()
             
             if choice == '1':
                 new_val = input(f"输入新的起始编号 (当前: {self['start_num']}): ").strip()
@@ -215,6 +399,7 @@ class ConfigManager:
                 }
                 if new_val in valid_levels:
                     self['compress_level'] = valid_levels[new_val]
+                    self['store_jpg'] = False  # 明确选择的压缩级别优先
                     print(f"✓ 压缩级别已更新为: {self.get_compress_level_name()}")
                 else:
                     print("✗ 无效的输入，请输入 0, 8, 12 或 14")
@@ -241,18 +426,32 @@ class ConfigManager:
             elif choice == '8':
                 print("ⓘ 放弃更改，返回主菜单")
                 return False
+            elif choice == '9':
+                new_val = not self['store_jpg']
+                self['store_jpg'] = new_val
+                print(f"✓ JPG直接存储已{'启用' if new_val else '禁用'}，当前压缩方式: {self.get_compress_level_name()}")
             else:
-                print("✗ 无效选项，请选择 1-8")
+                print("✗ 无效选项，请选择 1-9")
+    
+    def effective_compress_level(self):
+        """获取实际使用的压缩级别：启用store_jpg时直接存储"""
+        if self['store_jpg']:
+            return zipfile.ZIP_STORED
+        return self['compress_level']
     
     def get_compress_level_name(self):
-        """获取压缩级别的可读名称"""
+        """获取实际压缩级别的可读名称"""
         levels = {
             zipfile.ZIP_STORED: "无压缩 (ZIP_STORED)",
             zipfile.ZIP_DEFLATED: "标准压缩 (ZIP_DEFLATED)",
             zipfile.ZIP_BZIP2: "BZIP2 压缩 (ZIP_BZIP2)",
             zipfile.ZIP_LZMA: "LZMA 压缩 (ZIP_LZMA)"
         }
-        return levels.get(self['compress_level'], f"未知级别 ({self['compress_level']})")
+        level = self.effective_compress_level()
+        name = levels.get(level, f"未知级别 ({level})")
+        if level != self['compress_level']:
+            name += " [JPG直接存储]"
+        return name
 
 # ====================== 备份管理 ======================
 class BackupManager:
@@ -262,7 +461,7 @@ class BackupManager:
         self.config = config
         self.operation_log = []
     
-    def create_backup(self) -> Optional[Path]:
+    def create_backup(self, snapshot: Optional[TreeSnapshot] = None) -> Optional[Path]:
         """创建目录备份"""
         if not self.config["backup_enabled"]:
             logger.info("备份功能已禁用")
@@ -276,27 +475,42 @@ class BackupManager:
         try:
             self.backup_dir.mkdir(exist_ok=True)
             
-            # 使用rsync风格的备份，只复制需要的文件
-            total_files = 0
-            for src_path in self.root_dir.rglob('*'):
-                if any(skip in str(src_path) for skip in self.config["skip_dirs"]):
-                    continue
-                if src_path.is_file() and src_path.suffix.lower() in self.config["image_exts"]:
-                    total_files += 1
+            # 使用rsync风格的备份，只复制需要的文件（优先复用已有的扫描快照）
+            if snapshot is None:
+                snapshot = TreeSnapshot.from_root(self.root_dir, self.config)
+            dirs, names, parent_idx = snapshot.dirs, snapshot.names, snapshot.parent_idx
+            total_files = len(names)
+            
+            # 同一文件系统上用硬链接备份，不复制文件数据；后续步骤只重命名/删除/替换原文件，不会原地修改内容
+            copy_fn = _fast_copy
+            if self.config["backup_hardlink"] and os.stat(self.root_dir).st_dev == os.stat(self.backup_dir).st_dev:
+                copy_fn = os.link
             
+            # 每个源目录对应的备份目录只创建一次
+            dst_dirs = {}
             processed = 0
-            for src_path in self.root_dir.rglob('*'):
-                if any(skip in str(src_path) for skip in self.config["skip_dirs"]):
-                    continue
-                if src_path.is_file() and src_path.suffix.lower() in self.config["image_exts"]:
-                    rel_path = src_path.relative_to(self.root_dir)
-                    dst_path = backup_path / rel_path
-                    dst_path.parent.mkdir(parents=True, exist_ok=True)
-                    shutil.copy2(str(src_path), str(dst_path))
-                    processed += 1
-                    if processed % 100 == 0:
-                        progress = processed / max(total_files, 1)
-                        print(f"备份进度: {progress:.1%}", end='\r')
+            for name, dir_idx in zip(names, parent_idx):
+                src_dir = dirs[dir_idx]
+                dst_dir = dst_dirs.get(dir_idx)
+                if dst_dir is None:
+                    dst_dir = backup_path / os.path.relpath(src_dir, self.root_dir)
+                    dst_dir.mkdir(parents=True, exist_ok=True)
+                    dst_dirs[dir_idx] = dst_dir
+                src_file = os.path.join(src_dir, name)
+                dst_file = str(dst_dir / name)
+                try:
+                    copy_fn(src_file, dst_file)
+                except OSError:
+                    if copy_fn is _fast_copy:
+                        raise
+                    # 文件系统不支持硬链接（如FAT32/exFAT），改为复制
+                    logger.info("无法创建硬链接，备份改为复制文件")
+                    copy_fn = _fast_copy
+                    copy_fn(src_file, dst_file)
+                processed += 1
+                if processed % 100 == 0:
+                    progress = processed / max(total_files, 1)
+                    print(f"备份进度: {progress:.1%}", end='\r')
             
             print("\n备份完成!")
             logger.info(f"备份完成: {backup_path}")
@@ -318,6 +532,19 @@ class BackupManager:
             "target": str(target) if target else None
         })
     
+    def record_operations(self, operations):
+        """批量记录操作，operations为 (操作, 源路径, 目标路径或None) 的序列"""
+        timestamp = time.time()
+        self.operation_log.extend(
+            {
+                "timestamp": timestamp,
+                "operation": operation,
+                "source": str(source),
+                "target": str(target) if target else None
+            }
+            for operation, source, target in operations
+        )
+    
     def rollback(self):
         """回滚操作"""
         print("\n开始回滚操作...")
@@ -354,7 +581,7 @@ class DirectoryValidator:
         self.root_dir = root_dir
         self.config = config
     
-    def validate_structure(self) -> Tuple[bool, List[str]]:
+    def validate_structure(self, snapshot: Optional[TreeSnapshot] = None) -> Tuple[bool, List[str]]:
         """验证目录结构是否符合预期"""
         issues = []
         
@@ -375,7 +602,8 @@ class DirectoryValidator:
             issues.append(f"没有足够的写入权限: {self.root_dir} (在dry run模式下可忽略)")
         
         # 检查目录结构
-        parent_dirs = [d for d in self.root_dir.iterdir() if d.is_dir() and d.name not in self.config["skip_dirs"]]
+        skip_dirs = frozenset(self.config["skip_dirs"])
+        parent_dirs = [d for d in self.root_dir.iterdir() if d.is_dir() and d.name not in skip_dirs]
         
         if not parent_dirs:
             issues.append("未找到任何子目录，无法处理")
@@ -383,7 +611,7 @@ class DirectoryValidator:
         
         valid_structure = False
         for parent in parent_dirs:
-            subdirs = [d for d in parent.iterdir() if d.is_dir() and d.name not in self.config["skip_dirs"]]
+            subdirs = [d for d in parent.iterdir() if d.is_dir() and d.name not in skip_dirs]
             if subdirs:  # 如果有任何父目录包含子目录
                 valid_structure = True
                 break
@@ -391,13 +619,11 @@ class DirectoryValidator:
         if not valid_structure:
             issues.append("目录结构不符合预期。期望的结构: 根目录/父目录/子目录/图片文件")
         
-        # 检查是否有可处理的文件
-        image_files = []
-        for path in self.root_dir.rglob('*'):
-            if path.is_file() and path.suffix.lower() in self.config["image_exts"]:
-                image_files.append(path)
+        # 检查是否有可处理的文件（跳过目录在遍历时整体剪除，不再逐个路径判断）
+        if snapshot is None:
+            snapshot = TreeSnapshot.from_root(self.root_dir, self.config)
         
-        if not image_files:
+        if not len(snapshot):
             issues.append("未找到可处理的图像文件")
         
         return len(issues) == 0, issues
@@ -418,6 +644,12 @@ class DirectoryValidator:
             return True  # 无法检查时假设空间足够
 
 # ====================== 进度管理 ======================
+# 预生成进度条显示使用的各宽度进度条字符串：{宽度: [填充0格, 填充1格, ...]}
+_PROGRESS_BARS = {
+    width: ['#' * filled + ' ' * (width - filled) for filled in range(width + 1)]
+    for width in (15, 20, 30)
+}
+
 class ProgressManager:
     def __init__(self, total_steps=9, config: Optional[ConfigManager] = None):
         self.total_steps = total_steps
@@ -427,10 +659,12 @@ class ProgressManager:
         self.last_update = 0.0
         self.update_freq = config["progress_update_freq"] if config else 0.01
         self.is_windows = sys.platform.startswith('win')
-        self.last_display_time = time.time()
+        self.last_display_time = time.monotonic()
         self.min_update_interval = 0.1  # 最小更新间隔(秒)
         self.max_line_length = 120  # 最大行长度，用于清除残留字符
         self.min_width = 80
+        self._cached_width = self.max_line_length
+        self._width_checked_at = 0.0  # 上次查询终端宽度的时间
         
         # 尝试启用Windows ANSI支持
         if self.is_windows:
@@ -456,18 +690,24 @@ class ProgressManager:
         self.current_step += 1
         self.task_progress = 0.0
         self.last_update = 0.0
-        self.last_display_time = time.time()
+        self.last_display_time = time.monotonic()
         logger.info(f"STEP {self.current_step}: {step_name}")
         self._update_display()
     
     def update_task(self, progress: float):
-        self.task_progress = max(0.0, min(1.0, progress))
+        progress = max(0.0, min(1.0, progress))
+        self.task_progress = progress
         
-        # 实时更新：每次调用都尝试更新，但限制最小时间间隔
-        current_time = time.time()
+        # 距上次显示的进度变化不足update_freq时直接返回，不查询时间
+        if progress - self.last_update < self.update_freq and progress < 1.0:
+            return
+        
+        # 实时更新：限制最小时间间隔
+        current_time = time.monotonic()
         if (current_time - self.last_display_time) >= self.min_update_interval:
             self._update_display()
             self.last_display_time = current_time
+            self.last_update = progress
     
     def complete_step(self):
         """标记当前步骤完成"""
@@ -482,14 +722,20 @@ class ProgressManager:
             logger.warning(f"ANSI进度显示失败，回退到简单模式: {e}")
             self._update_display_simple()
     
+    def _terminal_width(self) -> int:
+        """获取终端宽度（每秒最多查询一次）"""
+        now = time.monotonic()
+        if now - self._width_checked_at >= 1.0:
+            try:
+                self._cached_width = max(shutil.get_terminal_size().columns, self.min_width)
+            except Exception:
+                self._cached_width = self.max_line_length
+            self._width_checked_at = now
+        return self._cached_width
+    
     def _update_display_ansi(self):
         """使用ANSI转义序列更新显示"""
-        # 获取终端宽度
-        try:
-            import shutil
-            width = max(shutil.get_terminal_size().columns, self.min_width)
-        except Exception:
-            width = self.max_line_length
+        width = self._terminal_width()
         
         # 上移光标覆盖之前的显示
         sys.stdout.write("\033[5A")  # 上移5行
@@ -514,11 +760,7 @@ class ProgressManager:
     
     def _update_display_simple(self):
         """简单文本模式更新显示（无ANSI支持）"""
-        try:
-            import shutil
-            width = max(shutil.get_terminal_size().columns, self.min_width)
-        except Exception:
-            width = self.max_line_length
+        width = self._terminal_width()
         
         total_progress = (self.current_step - 1 + self.task_progress) / self.total_steps
         line = "\r"  # 回到行首
@@ -534,22 +776,114 @@ class ProgressManager:
     @staticmethod
     def _create_bar(progress: float, width: int = 30) -> str:
         """创建进度条，使用#字符提高兼容性"""
-        filled = int(progress * width)
-        # 使用#字符替代█，提高终端兼容性
-        bar = '#' * filled + ' ' * (width - filled)
+        filled = min(max(int(progress * width), 0), width)
+        # 使用#字符替代█，提高终端兼容性；常用宽度直接查预生成的进度条
+        bars = _PROGRESS_BARS.get(width)
+        bar = bars[filled] if bars else '#' * filled + ' ' * (width - filled)
         percent = progress * 100
         return f"[{bar}] {percent:.1f}%"
 
 # ====================== 核心步骤实现 ======================
-def step1_convert(root: Path, progress: ProgressManager, config: ConfigManager, backup_manager: BackupManager):
+_turbo_jpeg = None
+
+def _get_turbojpeg():
+    """获取当前进程的TurboJPEG编码器，不可用时返回None"""
+    global _turbo_jpeg, TurboJPEG
+    if _turbo_jpeg is None and TurboJPEG is not None:
+        try:
+            _turbo_jpeg = TurboJPEG()
+        except Exception:
+            # 已安装PyTurboJPEG但找不到libturbojpeg动态库
+            TurboJPEG = None
+    return _turbo_jpeg
+
+def jpeg_encoder_name() -> str:
+    """返回当前使用的JPEG编码器名称"""
+    if _get_turbojpeg() is not None:
+        return "turbojpeg"
+    # pillow-simd的版本号带有.postN后缀
+    return "pillow-simd" if ".post" in PIL.__version__ else f"Pillow {PIL.__version__}"
+
+@contextmanager
+def read_image_header(path: Path):
+    """打开图像并一次性读取文件头信息，产出 (图像, 头信息字典)"""
+    # 只读取头部字段；不读取exif，getexif()需要额外解析且后续步骤用不到
+    with Image.open(path) as im:
+        yield im, {
+            "format": im.format,
+            "size": im.size,
+            "mode": im.mode,
+            "is_animated": getattr(im, 'is_animated', False),
+        }
+
+def _composite_on_white(img: "Image.Image") -> "Image.Image":
+    """使用numpy将RGBA图像按alpha合成到白色背景上"""
+    arr = np.asarray(img, dtype=np.uint16)
+    alpha = arr[..., 3:4]
+    # 整数运算：rgb * a + 255 * (255 - a)，四舍五入后除以255
+    rgb = (arr[..., :3] * alpha + 255 * (255 - alpha) + 127) // 255
+    return Image.fromarray(rgb.astype(np.uint8), 'RGB')
+
+def _convert_one(path_str: str) -> Tuple[str, str, Optional[str]]:
+    """转换单个图像为JPG（在子进程中执行，不访问日志和备份状态）
+    
+    返回 (源路径, 结果, 详情)：结果为 converted/renamed 时详情为新路径，
+    为 error 时为错误信息，为 skipped（动画GIF）时为None。
+    """
+    file = Path(path_str)
+    temp_path = None
+    try:
+        # 只读取文件头，以下判断均不解码像素数据；需要转换时复用同一个图像对象
+        with read_image_header(file) as (img, header):
+            # 跳过动画GIF
+            if file.suffix.lower() == '.gif' and header["is_animated"]:
+                return path_str, "skipped", None
+            
+            new_path = file.with_suffix('.jpg')
+            # 实际已是JPEG（扩展名错误），只需重命名，无需重新编码
+            if header["format"] == 'JPEG':
+                return path_str, "renamed", str(new_path)
+            
+            # 处理透明通道
+            if header["mode"] in ('RGBA', 'LA', 'P'):
+                if img.mode == 'P':
+                    img = img.convert('RGBA')
+                if img.mode == 'RGBA' and np is not None and img.size[0] * img.size[1] <= NUMPY_COMPOSITE_MAX_PIXELS:
+                    rgb_img = _composite_on_white(img)
+                else:
+                    background = Image.new('RGB', img.size, (255, 255, 255))
+                    background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+                    rgb_img = background
+            elif header["mode"] != 'RGB':
+                rgb_img = img.convert('RGB')
+            else:
+                rgb_img = img
+            
+            # 先写入临时文件再替换，不截断同名JPG的inode（硬链接备份可能与其共享）
+            temp_path = f"{os.path.splitext(path_str)[0]}.tmp_{uuid.uuid4().hex[:8]}.jpg"
+            jpeg = _get_turbojpeg()
+            if jpeg is not None:
+                # turbojpeg自行生成霍夫曼表，无需PIL的optimize
+                with open(temp_path, 'wb') as f:
+                    f.write(jpeg.encode(np.asarray(rgb_img), quality=95, pixel_format=TJPF_RGB))
+            else:
+                rgb_img.save(temp_path, 'JPEG', quality=95, optimize=True)
+        os.replace(temp_path, new_path)
+        return path_str, "converted", str(new_path)
+    except Exception as e:
+        if temp_path is not None and os.path.exists(temp_path):
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+        return path_str, "error", str(e)
+
+def step1_convert(root: Path, progress: ProgressManager, config: ConfigManager, backup_manager: BackupManager,
+                  snapshot: Optional[TreeSnapshot] = None):
     """步骤1：转换非JPG图像到JPG格式"""
-    convert_list = []
-    for path in root.rglob('*'):
-        if any(skip in str(path) for skip in config["skip_dirs"]):
-            continue
-        if path.is_file() and path.suffix.lower() in config["image_exts"]:
-            if path.suffix.lower() not in ('.jpg', '.jpeg'):
-                convert_list.append(path)
+    if snapshot is None:
+        snapshot = TreeSnapshot.from_root(root, config)
+    convert_list = snapshot.non_jpg_images()
     
     total = len(convert_list)
     if total == 0:
@@ -558,6 +892,7 @@ def step1_convert(root: Path, progress: ProgressManager, config: ConfigManager,
         return
     
     logger.info(f"步骤1：找到 {total} 个需要转换的图像文件")
+    logger.info(f"JPEG编码器: {jpeg_encoder_name()}")
     
     if not confirm_operation(
         f"即将转换 {total} 个非JPG图像到JPG格式，这将删除原始文件。确认继续?",
@@ -567,56 +902,77 @@ def step1_convert(root: Path, progress: ProgressManager, config: ConfigManager,
         progress.update_task(1.0)  # 确保任务进度100%
         return
     
-    for idx, file in enumerate(convert_list):
+    if config["dry_run"]:
+        for idx, file in enumerate(convert_list):
+            logger.info("[DRY RUN] 将转换 %s 为 JPG", file)
+            progress.update_task((idx+1)/total)
+        progress.complete_step()  # 确保步骤完成时进度为100%
+        return
+    
+    def handle_result(src, result, detail):
+        file = Path(src)
         try:
-            if not config["dry_run"]:
-                with Image.open(file) as img:
-                    # 跳过动画GIF
-                    if file.suffix.lower() == '.gif' and getattr(img, 'is_animated', False):
-                        logger.info(f"跳过动画GIF: {file}")
-                        continue
-                    
-                    # 处理透明通道
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        background = Image.new('RGB', img.size, (255, 255, 255))
-                        if img.mode == 'P':
-                            img = img.convert('RGBA')
-                        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                        rgb_img = background
-                    else:
-                        rgb_img = img.convert('RGB')
-                    
-                    new_path = file.with_suffix('.jpg')
-                    rgb_img.save(new_path, quality=95, optimize=True)
-                    
-                    backup_manager.record_operation("delete", file)
-                    file.unlink()
-                    logger.info(f"转换 {file} 为 {new_path}")
+            if result == "error":
+                logger.error(f"转换失败 {file}: {detail}")
+            elif result == "skipped":
+                logger.info("跳过动画GIF: %s", file)
+            elif result == "renamed":
+                os.replace(src, detail)
+                backup_manager.record_operation("rename", file, Path(detail))
+                logger.info("重命名JPEG %s 为 %s", file, detail)
             else:
-                logger.info(f"[DRY RUN] 将转换 {file} 为 JPG")
+                backup_manager.record_operation("delete", file)
+                file.unlink()
+                logger.info("转换 %s 为 %s", file, detail)
         except Exception as e:
             logger.error(f"转换失败 {file}: {e}")
-        
-        if total > 0:
+    
+    paths = [str(p) for p in convert_list]
+    if total < PARALLEL_CONVERT_MIN_FILES:
+        for idx, path_str in enumerate(paths):
+            handle_result(*_convert_one(path_str))
             progress.update_task((idx+1)/total)
+        progress.complete_step()  # 确保步骤完成时进度为100%
+        return
+    
+    # 解码/编码为CPU密集型操作，文件较多时使用进程池并行转换；
+    # 删除原文件和记录备份操作仍在主进程中完成
+    executor = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+    futures = [executor.submit(_convert_one, path_str) for path_str in paths]
+    handled = 0
+    try:
+        # 按提交顺序处理结果，与串行转换时的日志顺序一致
+        for future in futures:
+            handle_result(*future.result())
+            handled += 1
+            progress.update_task(handled/total)
+    except BaseException:
+        # 中断时取消尚未开始的转换；已完成的转换仍要删除原文件并记录，避免留下重复图像
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future in futures[handled:]:
+            if not future.cancelled() and future.exception() is None:
+                handle_result(*future.result())
+        raise
+    finally:
+        executor.shutdown()
     
     progress.complete_step()  # 确保步骤完成时进度为100%
 
 def step2_rename(root: Path, progress: ProgressManager, config: ConfigManager, backup_manager: BackupManager):
     """步骤2：四位数字重命名（解决冲突问题）"""
+    # 循环前取出配置值，避免循环内反复经过ConfigManager查找
+    skip_dirs = frozenset(config["skip_dirs"])
+    start_num = config["start_num"]
+    
     def process_subdir(subdir: Path):
         files = sorted([
             f for f in subdir.iterdir()
             if f.is_file() and f.suffix.lower() == '.jpg'
         ], key=natural_sort_key)
         
-        used_numbers = set()
-        start_num = config["start_num"]
-        
+        # 同一目录内 start_num + idx 天然唯一，无需额外查重
         for idx, file in enumerate(files):
             new_num = start_num + idx
-            while f"{new_num:04d}" in used_numbers:
-                new_num += 1
             
             if new_num >= start_num + 10000:  # 防止四位数溢出
                 logger.error(f"目录 {subdir} 中文件数量过多，超过编号范围")
@@ -626,14 +982,13 @@ def step2_rename(root: Path, progress: ProgressManager, config: ConfigManager, b
             new_path = subdir / new_name
             
             safe_rename(file, new_path, backup_manager, config)
-            used_numbers.add(f"{new_num:04d}")
     
     # 获取符合预期结构的子目录
     subdirs = []
     for parent in root.iterdir():
-        if parent.is_dir() and parent.name not in config["skip_dirs"]:
+        if parent.is_dir() and parent.name not in skip_dirs:
             for subdir in parent.iterdir():
-                if subdir.is_dir() and subdir.name not in config["skip_dirs"]:
+                if subdir.is_dir() and subdir.name not in skip_dirs:
                     subdirs.append(subdir)
     
     total = len(subdirs)
@@ -661,19 +1016,17 @@ def step2_rename(root: Path, progress: ProgressManager, config: ConfigManager, b
 
 def step3_rename_subdirs(root: Path, progress: ProgressManager, config: ConfigManager, backup_manager: BackupManager):
     """步骤3：重命名次级子目录为四位数字"""
+    skip_dirs = frozenset(config["skip_dirs"])
+    start_num = config["start_num"]
+    
     def process_parent(parent: Path):
         subdirs = sorted([
             d for d in parent.iterdir()
-            if d.is_dir() and d.name not in config["skip_dirs"]
+            if d.is_dir() and d.name not in skip_dirs
         ], key=natural_sort_key)
         
-        used_numbers = set()
-        start_num = config["start_num"]
-        
         for idx, subdir in enumerate(subdirs):
             new_num = start_num + idx
-            while f"{new_num:04d}" in used_numbers:
-                new_num += 1
             
             if new_num >= start_num + 10000:  # 防止四位数溢出
                 logger.error(f"父目录 {parent} 中子目录数量过多，超过编号范围")
@@ -683,11 +1036,10 @@ def step3_rename_subdirs(root: Path, progress: ProgressManager, config: ConfigMa
             new_path = parent / new_name
             
             safe_rename(subdir, new_path, backup_manager, config)
-            used_numbers.add(new_name)
     
     parent_dirs = [
         d for d in root.iterdir()
-        if d.is_dir() and d.name not in config["skip_dirs"]
+        if d.is_dir() and d.name not in skip_dirs
     ]
     
     total = len(parent_dirs)
@@ -715,11 +1067,13 @@ def step3_rename_subdirs(root: Path, progress: ProgressManager, config: ConfigMa
 
 def step4_add_prefix(root: Path, progress: ProgressManager, config: ConfigManager, backup_manager: BackupManager):
     """步骤4：添加目录名前缀"""
+    skip_dirs = frozenset(config["skip_dirs"])
+    
     subdirs = []
     for parent in root.iterdir():
-        if parent.is_dir() and parent.name not in config["skip_dirs"]:
+        if parent.is_dir() and parent.name not in skip_dirs:
             for subdir in parent.iterdir():
-                if subdir.is_dir() and subdir.name not in config["skip_dirs"]:
+                if subdir.is_dir() and subdir.name not in skip_dirs:
                     subdirs.append(subdir)
     
     total = len(subdirs)
@@ -761,11 +1115,14 @@ def step4_add_prefix(root: Path, progress: ProgressManager, config: ConfigManage
 
 def step5_move_files(root: Path, progress: ProgressManager, config: ConfigManager, backup_manager: BackupManager):
     """步骤5：移动文件到父目录"""
+    skip_dirs = frozenset(config["skip_dirs"])
+    dry_run = config["dry_run"]
+    
     subdirs = []
     for parent in root.iterdir():
-        if parent.is_dir() and parent.name not in config["skip_dirs"]:
+        if parent.is_dir() and parent.name not in skip_dirs:
             for subdir in parent.iterdir():
-                if subdir.is_dir() and subdir.name not in config["skip_dirs"]:
+                if subdir.is_dir() and subdir.name not in skip_dirs:
                     subdirs.append((subdir, parent))  # (子目录, 父目录)
     
     total = len(subdirs)
@@ -784,51 +1141,91 @@ def step5_move_files(root: Path, progress: ProgressManager, config: ConfigManage
         progress.update_task(1.0)  # 确保任务进度100%
         return
     
+    # 先按顺序确定每个文件的目标路径（冲突编号依赖处理顺序），再并行执行移动
+    moves = []
+    taken_by_parent = {}  # 父目录 -> 已存在或已分配的文件名（normcase后）
     for idx, (subdir, parent_dir) in enumerate(subdirs):
+        taken = taken_by_parent.get(parent_dir)
+        if taken is None:
+            taken = {os.path.normcase(name) for name in os.listdir(parent_dir)}
+            taken_by_parent[parent_dir] = taken
+        
         files = sorted([
             f for f in subdir.glob('*.jpg')
             if f.is_file()
         ], key=natural_sort_key)
         
         for file in files:
-            try:
-                base_name = file.name
-                new_path = parent_dir / base_name
-                counter = 1
-                
-                # 处理文件名冲突
-                while new_path.exists() and counter <= 100:
-                    new_name = f"{file.stem}_{counter}{file.suffix}"
-                    new_path = parent_dir / new_name
-                    counter += 1
-                
-                if counter > 100:
-                    logger.error(f"无法解决文件名冲突: {file}")
-                    continue
-                
-                if not config["dry_run"]:
-                    shutil.move(str(file), str(new_path))
-                    
-                    # 记录操作
-                    backup_manager.record_operation("move", file, new_path)
-                    logger.info(f"移动 {file} 到 {new_path}")
-            except Exception as e:
-                logger.error(f"移动失败 {file}: {e}")
-        
-        if total > 0:
-            progress.update_task((idx+1)/total)
+            new_name = file.name
+            counter = 1
+            
+            # 处理文件名冲突
+            while os.path.normcase(new_name) in taken and counter <= 100:
+                new_name = f"{file.stem}_{counter}{file.suffix}"
+                counter += 1
+            
+            if counter > 100:
+                logger.error(f"无法解决文件名冲突: {file}")
+                continue
+            
+            taken.add(os.path.normcase(new_name))
+            moves.append((file, parent_dir / new_name))
+    
+    if dry_run or not moves:
+        progress.complete_step()  # 确保步骤完成时进度为100%
+        return
+    
+    # 移动是I/O操作，系统调用期间释放GIL，多线程可同时进行多个重命名；
+    # 记录操作和日志仍在主线程中完成
+    total_moves = len(moves)
+    def handle_move(future):
+        file, new_path = futures[future]
+        try:
+            future.result()
+            
+            # 记录操作
+            backup_manager.record_operation("move", file, new_path)
+            logger.info("移动 %s 到 %s", file, new_path)
+        except Exception as e:
+            logger.error(f"移动失败 {file}: {e}")
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, config["parallel_moves"]))
+    futures = {
+        executor.submit(shutil.move, str(file), str(new_path)): (file, new_path)
+        for file, new_path in moves
+    }
+    pending = set(futures)
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            pending.discard(future)
+            handle_move(future)
+            progress.update_task(done / total_moves)
+    except BaseException:
+        # 中断时取消尚未开始的移动；已完成的移动仍要记录，以便回滚
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future in pending:
+            if not future.cancelled():
+                handle_move(future)
+        raise
+    finally:
+        executor.shutdown()
     
     progress.complete_step()  # 确保步骤完成时进度为100%
 
 def step6_clean_dirs(root: Path, progress: ProgressManager, config: ConfigManager, backup_manager: BackupManager):
     """步骤6：删除空目录"""
-    dirs = []
-    for path in root.rglob('*'):
-        if path.is_dir() and path.name not in config["skip_dirs"]:
-            dirs.append(path)
+    skip_dirs = frozenset(config["skip_dirs"])
+    dry_run = config["dry_run"]
+    root_str = str(root)
     
-    # 逆序处理，确保先处理子目录
-    dirs = sorted(dirs, key=lambda x: len(str(x)), reverse=True)
+    # 自顶向下遍历以便剪除skip_dirs子树，再逆序得到“子目录先于父目录”的处理顺序；
+    # 同时保留每个目录剪除前的内容快照，无需再次读取目录
+    dirs = []
+    for dirpath, dirnames, filenames in os.walk(root_str):
+        if dirpath != root_str:
+            dirs.append((dirpath, list(dirnames), filenames))
+        dirnames[:] = [d for d in dirnames if d not in skip_dirs]
+    dirs.reverse()
     
     total = len(dirs)
     logger.info(f"步骤6：检查 {total} 个目录是否为空")
@@ -846,30 +1243,39 @@ def step6_clean_dirs(root: Path, progress: ProgressManager, config: ConfigManage
         progress.update_task(1.0)  # 确保任务进度100%
         return
     
-    removed_count = 0
-    for idx, path in enumerate(dirs):
-        try:
-            if not any(path.iterdir()):  # 目录为空
-                if not config["dry_run"]:
-                    path.rmdir()
-                    backup_manager.record_operation("delete", path)
-                    logger.info(f"移除空目录: {path}")
-                    removed_count += 1
-        except Exception as e:
-            logger.error(f"移除目录失败 {path}: {e}")
-        
-        if total > 0:
-            progress.update_task((idx+1)/total)
+    removed = set()
+    ops = []  # 待批量记录的操作
+    try:
+        for idx, (dirpath, dirnames, filenames) in enumerate(dirs):
+            # 没有文件且子目录都已被移除时目录为空
+            if not filenames and all(os.path.join(dirpath, d) in removed for d in dirnames):
+                if not dry_run:
+                    try:
+                        os.rmdir(dirpath)
+                        removed.add(dirpath)
+                        ops.append(("delete", dirpath, None))
+                        logger.info("移除空目录: %s", dirpath)
+                    except Exception as e:
+                        logger.error(f"移除目录失败 {dirpath}: {e}")
+            
+            if total > 0:
+                progress.update_task((idx+1)/total)
+    finally:
+        # 中断时也要记录已完成的操作
+        backup_manager.record_operations(ops)
     
-    logger.info(f"步骤6：共移除 {removed_count} 个空目录")
+    logger.info(f"步骤6：共移除 {len(removed)} 个空目录")
     progress.complete_step()  # 确保步骤完成时进度为100%
 
 def step7_final_rename(root: Path, progress: ProgressManager, config: ConfigManager, backup_manager: BackupManager):
     """步骤7：最终四位数字重命名（从0001开始）"""
+    skip_dirs = frozenset(config["skip_dirs"])
+    dry_run = config["dry_run"]
+    
     # 获取所有父目录
     parent_dirs = [
         d for d in root.iterdir()
-        if d.is_dir() and d.name not in config["skip_dirs"]
+        if d.is_dir() and d.name not in skip_dirs
     ]
     
     total = len(parent_dirs)
@@ -889,94 +1295,164 @@ def step7_final_rename(root: Path, progress: ProgressManager, config: ConfigMana
         return
     
     for idx, directory in enumerate(parent_dirs):
-        # 使用临时目录进行重命名
-        with tempfile.TemporaryDirectory(dir=str(directory.parent)) as temp_dir:
-            temp_path = Path(temp_dir)
-            files = sorted([
-                f for f in directory.glob('*.jpg')
-                if f.is_file()
-            ], key=natural_sort_key)
-            
-            # 阶段1：移动到临时目录
+        # 循环中使用字符串路径，避免为每个文件构造Path对象；
+        # normcase使匹配规则与原来的glob('*.jpg')一致（Windows不区分大小写）
+        dir_s = str(directory)
+        with os.scandir(dir_s) as it:
+            names = sorted([
+                entry.name for entry in it
+                if os.path.normcase(entry.name).endswith('.jpg') and entry.is_file()
+            ], key=_natural_sort_key_cached)
+        
+        ops = []  # 本目录待批量记录的操作
+        try:
+            # 阶段1：在目录内改为唯一的临时文件名（同一目录内重命名，不经过临时目录）
             temp_files = []
-            for file in files:
-                if config["dry_run"]:
-                    temp_files.append((file.name, file))
+            for i, name in enumerate(names):
+                file = os.path.join(dir_s, name)
+                if dry_run:
+                    temp_files.append((name, file))
                     continue
                 
-                temp_file = temp_path / file.name
+                temp_file = os.path.join(dir_s, f".__tmp_{i:08x}_{name}")
                 try:
-                    shutil.move(str(file), str(temp_file))
-                    temp_files.append((file.name, temp_file))
-                    backup_manager.record_operation("move", file, temp_file)
+                    os.replace(file, temp_file)
+                    temp_files.append((name, temp_file))
+                    ops.append(("move", file, temp_file))
                 except Exception as e:
-                    logger.error(f"移动到临时目录失败 {file}: {e}")
+                    logger.error(f"重命名为临时文件失败 {file}: {e}")
             
-            # 阶段2：从临时目录移回并重命名
+            # 阶段2：从临时文件名重命名为最终编号
             for new_idx, (orig_name, temp_file) in enumerate(temp_files, start=1):
                 new_name = f"{new_idx:04d}.jpg"
-                new_path = directory / new_name
+                new_path = os.path.join(dir_s, new_name)
                 
-                if config["dry_run"]:
-                    logger.info(f"[DRY RUN] 将重命名 {orig_name} 为 {new_name}")
+                if dry_run:
+                    logger.info("[DRY RUN] 将重命名 %s 为 %s", orig_name, new_name)
                     continue
                 
                 try:
-                    shutil.move(str(temp_file), str(new_path))
-                    backup_manager.record_operation("move", temp_file, new_path)
-                    logger.info(f"重命名 {orig_name} 为 {new_name}")
+                    # 阶段1失败而留在原位的文件可能恰好占用目标名，不覆盖
+                    _rename_noreplace(temp_file, new_path)
+                    ops.append(("move", temp_file, new_path))
+                    logger.info("重命名 %s 为 %s", orig_name, new_name)
                 except Exception as e:
                     logger.error(f"重命名失败 {orig_name}: {e}")
+        finally:
+            backup_manager.record_operations(ops)
         
         if total > 0:
             progress.update_task((idx+1)/total)
     
     progress.complete_step()  # 确保步骤完成时进度为100%
 
-def step8_compress(root: Path, progress: ProgressManager, config: ConfigManager, backup_manager: BackupManager):
-    """步骤8：压缩叶目录（没有子目录且只包含JPG文件的目录）"""
-    # 查找所有符合条件的叶目录
-    leaf_dirs = []
-    
-    # 递归遍历所有目录
-    for directory in root.rglob('*'):
-        if not directory.is_dir() or directory.name in config["skip_dirs"]:
+def _scan_leaves(root: Path, skip_dirs):
+    """遍历目录树，产出叶目录及其中的JPG文件名 (目录路径, [文件名, ...])
+    
+    叶目录指没有子目录且只包含JPG文件的目录；每个目录只调用一次os.scandir，
+    使用DirEntry缓存的类型信息，不再逐项stat。
+    """
+    skip = frozenset(skip_dirs)
+    root_str = str(root)
+    stack = [root_str]
+    while stack:
+        directory = stack.pop()
+        jpg_names = []
+        valid_dir = True
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    name = entry.name
+                    if name in skip:
+                        continue  # 跳过的目录在入栈前剪枝，整棵子树都不再遍历
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    if entry.is_dir():
+                        valid_dir = False  # 有子目录的不是叶目录
+                    elif entry.is_file():
+                        if os.path.splitext(name)[1].lower() in JPG_SUFFIXES:
+                            jpg_names.append(name)
+                        else:
+                            # 遇到非JPG文件，标记为无效
+                            if valid_dir:
+                                logger.debug(f"跳过目录 {directory}，包含非JPG文件: {name}")
+                            valid_dir = False
+                    else:
+                        valid_dir = False
+        except OSError as e:
+            logger.warning(f"读取目录失败 {directory}: {e}")
             continue
         
-        # 检查是否包含子目录
-        has_subdirs = any(
-            item.is_dir() and item.name not in config["skip_dirs"]
-            for item in directory.iterdir()
-        )
-        
-        if has_subdirs:
-            continue  # 有子目录的不是叶目录
+        if valid_dir and jpg_names and directory != root_str:
+            yield directory, jpg_names
+
+def _compress_leaf(directory: str, jpg_names: List[str], compress_level: int,
+                   verify: bool = False, chunk_size: int = 1024 * 1024) -> Tuple[str, str, Optional[str]]:
+    """将一个叶目录压缩为ZIP，不删除原目录（可在子进程中执行，不访问日志和备份状态）
+    
+    返回 (目录路径, ZIP路径, 错误信息)，成功时错误信息为None。
+    """
+    # 全程使用字符串路径，避免循环中构造Path对象；与Path.with_suffix一样替换目录名的扩展名
+    base = os.path.splitext(directory)[0]
+    zip_file = base + '.zip'
+    # 直接使用扫描时收集的文件名，不再重新列出目录
+    jpg_names = sorted(jpg_names, key=_natural_sort_key_cached)
+    
+    # 使用临时文件创建压缩包
+    unique_id = uuid.uuid4().hex[:8]
+    temp_zip = f"{base}.tmp_{unique_id}.zip"
+    try:
+        with zipfile.ZipFile(temp_zip, 'w', compress_level) as zf:
+            # 按自然顺序添加JPG文件；按chunk_size大块流式写入，减少小块read()调用
+            written = 0
+            for name in jpg_names:
+                file = os.path.join(directory, name)
+                zinfo = zipfile.ZipInfo.from_file(file, arcname=name)
+                zinfo.compress_type = compress_level
+                with open(file, 'rb', buffering=0) as src, zf.open(zinfo, 'w') as dst:
+                    shutil.copyfileobj(src, dst, chunk_size)
+                written += 1
         
-        # 检查是否只包含JPG文件
-        jpg_files = []
-        valid_dir = True
+        if written != len(jpg_names):
+            raise Exception(f"ZIP文件验证失败: {temp_zip}")
         
-        for item in directory.iterdir():
-            if item.name in config["skip_dirs"]:
-                continue
-            
-            if item.is_file():
-                if item.suffix.lower() in ['.jpg', '.jpeg']:
-                    jpg_files.append(item)
-                else:
-                    # 遇到非JPG文件，标记为无效
-                    valid_dir = False
-                    logger.debug(f"跳过目录 {directory}，包含非JPG文件: {item.name}")
-                    break
-            else:  # 遇到子目录（虽然前面检查过，但再次确认）
-                valid_dir = False
-                break
+        # 可选：重新打开压缩包校验所有文件的CRC
+        if verify:
+            try:
+                with zipfile.ZipFile(temp_zip, 'r') as zf:
+                    bad_file = zf.testzip()
+            except Exception as e:
+                raise Exception(f"验证ZIP文件失败 {temp_zip}: {e}")
+            if bad_file is not None:
+                raise Exception(f"ZIP文件验证失败: {temp_zip} ({bad_file} CRC错误)")
         
-        if valid_dir and jpg_files:
-            leaf_dirs.append(directory)
+        # 重命名临时文件（覆盖已存在的同名ZIP）
+        os.replace(temp_zip, zip_file)
+        return directory, zip_file, None
+    except Exception as e:
+        error = str(e)
+        # 清理临时文件
+        if os.path.exists(temp_zip):
+            try:
+                os.unlink(temp_zip)
+            except Exception as cleanup_e:
+                error += f"；清理临时ZIP文件失败 {temp_zip}: {cleanup_e}"
+        return directory, zip_file, error
+
+def step8_compress(root: Path, progress: ProgressManager, config: ConfigManager, backup_manager: BackupManager):
+    """步骤8：压缩叶目录（没有子目录且只包含JPG文件的目录）"""
+    dry_run = config["dry_run"]
+    # JPG数据已经压缩过，再次DEFLATE几乎不减小体积却耗费大量CPU
+    compress_level = config.effective_compress_level()
+    verify_zip = config["verify_zip"]
+    chunk_size = config["compress_chunk_bytes"]
     
-    # 按路径深度排序，确保先处理深层目录
-    leaf_dirs.sort(key=lambda x: len(x.parts), reverse=True)
+    # 查找所有符合条件的叶目录
+    leaf_files = dict(_scan_leaves(root, config["skip_dirs"]))  # 叶目录 -> 其中的JPG文件名
+    leaf_dirs = list(leaf_files)
+    
+    # 按路径深度排序，确保先处理深层目录（统计分隔符个数，无需拆分路径）
+    leaf_dirs.sort(key=lambda x: x.count(os.sep), reverse=True)
     
     total = len(leaf_dirs)
     logger.info(f"步骤8：找到 {total} 个叶目录需要压缩")
@@ -994,75 +1470,74 @@ def step8_compress(root: Path, progress: ProgressManager, config: ConfigManager,
         progress.update_task(1.0)  # 确保任务进度100%
         return
     
-    for idx, directory in enumerate(leaf_dirs):
-        zip_file = directory.with_suffix('.zip')
-        jpg_files = sorted([f for f in directory.glob('*.jpg')], key=natural_sort_key)
-        
-        if not config["dry_run"]:
-            try:
-                # 使用临时文件创建压缩包
-                unique_id = uuid.uuid4().hex[:8]
-                temp_zip = directory.with_suffix(f'.tmp_{unique_id}.zip')
-                
-                with zipfile.ZipFile(temp_zip, 'w', config["compress_level"]) as zf:
-                    # 按自然顺序添加JPG文件
-                    for file in jpg_files:
-                        zf.write(file, arcname=file.name)
-                        logger.debug(f"添加到ZIP: {file.name}")
-                
-                # 验证压缩包
-                valid = False
-                try:
-                    with zipfile.ZipFile(temp_zip, 'r') as zf:
-                        zip_contents = zf.namelist()
-                        valid = len(zip_contents) == len(jpg_files)
-                except Exception as e:
-                    logger.error(f"验证ZIP文件失败 {temp_zip}: {e}")
-                
-                if not valid:
-                    raise Exception(f"ZIP文件验证失败: {temp_zip}")
-                
-                # 重命名临时文件
-                if temp_zip.exists():
-                    if zip_file.exists():
-                        zip_file.unlink()
-                    temp_zip.rename(zip_file)
-                    
-                    # 记录操作
-                    backup_manager.record_operation("create", zip_file)
-                    
-                    # 删除原始目录
-                    shutil.rmtree(directory)
-                    backup_manager.record_operation("delete", directory)
-                    
-                    logger.info(f"压缩 {directory} 为 {zip_file}")
-            except Exception as e:
-                logger.error(f"压缩失败 {directory}: {e}")
-                
-                # 清理临时文件
-                if 'temp_zip' in locals() and Path(temp_zip).exists():
-                    try:
-                        Path(temp_zip).unlink()
-                        logger.info(f"已清理无效的临时ZIP文件: {temp_zip}")
-                    except Exception as cleanup_e:
-                        logger.error(f"清理临时ZIP文件失败 {temp_zip}: {cleanup_e}")
-                
-                # 继续处理下一个目录
-                continue
-        else:
-            logger.info(f"[DRY RUN] 将压缩 {directory} 为 {zip_file}")
-        
-        if total > 0:
+    if dry_run:
+        for idx, directory in enumerate(leaf_dirs):
+            logger.info("[DRY RUN] 将压缩 %s 为 %s", directory, os.path.splitext(directory)[0] + '.zip')
             progress.update_task((idx+1)/total)
+        progress.complete_step()  # 确保步骤完成时进度为100%
+        return
+    
+    # 各叶目录相互独立，并行压缩；叶目录较少时使用线程（zlib压缩期间释放GIL），
+    # 较多时使用进程池。记录备份操作和日志仍在主进程中完成。
+    # 删除原目录交给单独的后台线程，与后续压缩重叠进行
+    workers = MAX_WORKERS
+    executor_cls = ThreadPoolExecutor if total < workers * 2 else ProcessPoolExecutor
+    executor = executor_cls(max_workers=workers)
+    cleanup_pool = ThreadPoolExecutor(max_workers=1)
+    futures = [
+        executor.submit(_compress_leaf, directory, leaf_files[directory], compress_level,
+                        verify_zip, chunk_size)
+        for directory in leaf_dirs
+    ]
+    pending = set(futures)
+    cleanup_futures = {}
+    ops = []  # 待批量记录的操作
+    try:
+        for idx, future in enumerate(as_completed(futures)):
+            pending.discard(future)
+            directory, zip_file, error = future.result()
+            if error is None:
+                ops.append(("create", zip_file, None))
+                cleanup_futures[cleanup_pool.submit(shutil.rmtree, directory)] = directory
+                logger.info("压缩 %s 为 %s", directory, zip_file)
+            else:
+                logger.error(f"压缩失败 {directory}: {error}")
+            
+            progress.update_task((idx+1)/total)
+    except BaseException:
+        # 中断时取消尚未开始的压缩；已写好但未处理的ZIP删除，其原目录保持不变
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future in pending:
+            if not future.cancelled() and future.exception() is None:
+                directory, zip_file, error = future.result()
+                if error is None:
+                    try:
+                        os.unlink(zip_file)
+                    except OSError as e:
+                        logger.error(f"删除未完成的ZIP失败 {zip_file}: {e}")
+        raise
+    finally:
+        executor.shutdown()
+        # 等待已提交的删除完成（中断时也一样），报告错误并记录操作
+        cleanup_pool.shutdown()
+        for future, directory in cleanup_futures.items():
+            error = future.exception()
+            if error is None:
+                ops.append(("delete", directory, None))
+            else:
+                logger.error(f"删除原目录失败 {directory}: {error}")
+        backup_manager.record_operations(ops)
     
     progress.complete_step()  # 确保步骤完成时进度为100%
 
 def step9_rename_cbz(root: Path, progress: ProgressManager, config: ConfigManager, backup_manager: BackupManager):
     """步骤9：重命名ZIP为CBZ"""
-    zip_files = [
-        f for f in root.glob('*.zip')
-        if f.is_file()
-    ]
+    # scandir的DirEntry自带文件类型，无需逐个stat
+    with os.scandir(root) as it:
+        zip_files = [
+            Path(entry.path) for entry in it
+            if os.path.normcase(entry.name).endswith('.zip') and entry.is_file(follow_symlinks=False)
+        ]
     
     total = len(zip_files)
     logger.info(f"步骤9：重命名 {total} 个ZIP文件为CBZ")
@@ -1085,19 +1560,32 @@ def step9_rename_cbz(root: Path, progress: ProgressManager, config: ConfigManage
         
         if not config["dry_run"]:
             try:
-                zip_file.rename(cbz_file)
+                os.rename(zip_file, cbz_file)
                 backup_manager.record_operation("rename", zip_file, cbz_file)
-                logger.info(f"重命名 {zip_file} 为 {cbz_file}")
+                logger.info("重命名 %s 为 %s", zip_file, cbz_file)
             except Exception as e:
                 logger.error(f"重命名失败 {zip_file}: {e}")
         else:
-            logger.info(f"[DRY RUN] 将重命名 {zip_file} 为 {cbz_file}")
+            logger.info("[DRY RUN] 将重命名 %s 为 %s", zip_file, cbz_file)
         
         if total > 0:
             progress.update_task((idx+1)/total)
     
     progress.complete_step()  # 确保步骤完成时进度为100%
 
+# 处理步骤及其显示名称，按执行顺序排列
+STEPS = (
+    (step1_convert, "转换非JPG图像"),
+    (step2_rename, "四位数字重命名"),
+    (step3_rename_subdirs, "重命名次级目录"),
+    (step4_add_prefix, "添加目录名前缀"),
+    (step5_move_files, "移动文件到父目录"),
+    (step6_clean_dirs, "清理空目录"),
+    (step7_final_rename, "最终文件重命名"),
+    (step8_compress, "压缩子目录"),
+    (step9_rename_cbz, "重命名ZIP为CBZ"),
+)
+
 # ====================== 主程序 ======================
 def parse_arguments():
     """解析命令行参数"""
@@ -1111,7 +1599,14 @@ def parse_arguments():
     parser.add_argument('--max-files', type=int, help='每个目录最大文件数')
     return parser.parse_args()
 
-def main():
+def main(root_dir: Optional[Path] = None):
+    try:
+        _main(root_dir)
+    finally:
+        # 无论正常结束、提前返回还是异常退出，都写出缓存的日志
+        flush_logs()
+
+def _main(root_dir: Optional[Path] = None):
     global logger
     
     # 配置参数解析 - 由于在GUI中使用，我们不需要命令行参数
@@ -1127,8 +1622,8 @@ def main():
     
     args = Args()
     
-    # 获取根目录
-    root_dir = get_root()
+    # 获取根目录（未指定时使用当前工作目录）
+    root_dir = Path(root_dir) if root_dir else get_root()
     print(f"根目录: {root_dir.resolve()}")
     
     # 设置日志
@@ -1143,7 +1638,7 @@ def main():
             logger.warning(f"设置Windows控制台模式失败: {e}")
     
     # 初始化配置
-    config_file = Path(args.config) if args.config else None
+    config_file = Path(args.config) if args.config else root_dir / 'config.json'
     config = ConfigManager(config_file)
     
     # 应用命令行参数覆盖配置
@@ -1170,15 +1665,19 @@ def main():
         }
         if args.compress_level.lower() in level_map:
             config["compress_level"] = level_map[args.compress_level.lower()]
+            config["store_jpg"] = False  # 明确指定的压缩级别优先
         else:
             print(f"警告: 无效的压缩级别 '{args.compress_level}'，使用默认级别")
     
     if args.max_files:
         config["max_files_per_dir"] = args.max_files
     
+    # 扫描一次目录树，结构验证、备份和步骤1共用（步骤1之后目录结构会改变，不再复用）
+    snapshot = TreeSnapshot.from_root(root_dir, config)
+    
     # 验证目录结构
     validator = DirectoryValidator(root_dir, config)
-    is_valid, issues = validator.validate_structure()
+    is_valid, issues = validator.validate_structure(snapshot)
     
     if not is_valid:
         print("\n目录结构验证失败，发现以下问题:")
@@ -1205,7 +1704,7 @@ def main():
     # 创建备份
     backup_manager = BackupManager(root_dir, config)
     if config["backup_enabled"] and not config["dry_run"]:
-        backup_path = backup_manager.create_backup()
+        backup_path = backup_manager.create_backup(snapshot)
         if not backup_path:
             print("警告: 备份创建失败，继续操作可能有风险")
             if config["interactive_mode"]:
@@ -1235,37 +1734,14 @@ def main():
                 return
     
     # 创建进度管理器
-    progress = ProgressManager(total_steps=9, config=config)
+    progress = ProgressManager(total_steps=len(STEPS), config=config)
     
     try:
-        # 执行处理步骤
-        step_functions = [
-            step1_convert,
-            step2_rename,
-            step3_rename_subdirs,
-            step4_add_prefix,
-            step5_move_files,
-            step6_clean_dirs,
-            step7_final_rename,
-            step8_compress,
-            step9_rename_cbz
-        ]
-        
-        step_names = [
-            "转换非JPG图像",
-            "四位数字重命名",
-            "重命名次级目录",
-            "添加目录名前缀",
-            "移动文件到父目录",
-            "清理空目录",
-            "最终文件重命名",
-            "压缩子目录",
-            "重命名ZIP为CBZ"
-        ]
-        
-        for step_func, step_name in zip(step_functions, step_names):
+        # 执行处理步骤（步骤1复用开始时的扫描快照）
+        step_kwargs = {step1_convert: {"snapshot": snapshot}}
+        for step_func, step_name in STEPS:
             progress.step_start(step_name)
-            step_func(root_dir, progress, config, backup_manager)
+            step_func(root_dir, progress, config, backup_manager, **step_kwargs.get(step_func, {}))
         
         # 确保最后显示100%完成
         progress.complete_step()
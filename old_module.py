@@ -4,6 +4,7 @@ import logging
 import shutil
 import zipfile
 import re
+import time
 from pathlib import Path
 from PIL import Image
 from typing import Set
@@ -29,6 +30,8 @@ class ProgressManager:
         self.current_step = 0
         self.total_progress = 0.0
         self.task_progress = 0.0
+        self.min_update_interval = 0.016  # 最小刷新间隔(秒)，期间的更新合并到下一次刷新
+        self.last_display_time = 0.0
         print("\n" * 3)  # 为进度条预留空间
         self._update_display()
 
@@ -40,6 +43,11 @@ class ProgressManager:
 
     def update_task(self, progress: float):
         self.task_progress = max(0.0, min(1.0, progress))
+        # 限制刷新频率；任务完成时总是刷新，确保显示100%
+        now = time.monotonic()
+        if self.task_progress < 1.0 and now - self.last_display_time < self.min_update_interval:
+            return
+        self.last_display_time = now
         self._update_display()
 
     def _update_display(self):
@@ -265,14 +273,14 @@ def step9_rename_cbz(root: Path, progress: ProgressManager):
         progress.update_task((idx+1)/total)
 
 # ====================== 主程序 ======================
-def main():
+def main(root_dir=None):
     """主函数，执行处理流程"""
-    root_dir = get_root()
+    root_dir = Path(root_dir) if root_dir else get_root()
     print(f"根目录: {root_dir.resolve()}")
 
     # 配置日志
     logging.basicConfig(
-        filename='conversion.log',
+        filename=str(root_dir / 'conversion.log'),
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s',
         filemode='w'